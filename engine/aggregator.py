@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+
+from engine.models import EventRecord
+
+
+KeyFn = Callable[[EventRecord], Optional[Hashable]]
+Predicate = Callable[[EventRecord], bool]
+DistinctFn = Callable[[EventRecord], Hashable]
+
+
+@dataclass(slots=True)
+class _Stream:
+    key_fn: KeyFn
+    pred: Predicate
+    window_ns: int
+    distinct_fn: Optional[DistinctFn] = None
+    times: dict[Any, deque] = field(default_factory=dict)
+    values: dict[Any, deque] = field(default_factory=dict)
+    distinct: dict[Any, Counter] = field(default_factory=dict)
+    next_sweep_ns: int = 0
+
+
+class WindowAggregator:
+    """
+    Rolling per-key counts over registered event streams.
+
+    Each stream is a predicate plus a partition key: add() tests the
+    predicate once per record and appends its arrival time (int epoch ns)
+    to the keyed deque. count()/distinct() evict expired entries and read
+    the result in amortized O(1), so rules never rescan raw events.
+
+    A stream keeps its full window; count() may ask for any shorter
+    window, answered with a bisect over the sorted timestamps, so rules
+    that share a predicate and key can share one stream.
+
+    Records can arrive slightly out of receive order (concurrent requests,
+    wall-clock steps), so each keyed deque clamps its timestamps to be
+    non-decreasing: a late record counts as arriving with its predecessor.
+    That keeps the bisect and front-only eviction valid.
+
+    Reads only evict the key they ask about, so keys that are never queried
+    again (a sprayed user, a one-off source IP) are swept separately: once
+    per window, add() drops every key whose newest entry is out of the
+    window. Live keys are bounded by those active in the last two windows,
+    and the sweep costs O(keys) per window, amortized over the adds.
+    """
+
+    def __init__(self):
+        self._streams: dict[str, _Stream] = {}
+
+    def register(
+        self,
+        name: str,
+        key_fn: KeyFn,
+        pred: Predicate,
+        window_seconds: int,
+        distinct_fn: Optional[DistinctFn] = None,
+    ) -> None:
+        self._streams[name] = _Stream(
+            key_fn=key_fn,
+            pred=pred,
+            window_ns=window_seconds * 1_000_000_000,
+            distinct_fn=distinct_fn,
+        )
+
+    def add(self, record: EventRecord) -> None:
+        ts = record.received_ns
+        for s in self._streams.values():
+            if not s.pred(record):
+                continue
+            key = s.key_fn(record)
+            if key is None:
+                continue
+            if ts >= s.next_sweep_ns:
+                self._sweep(s, ts)
+            times = s.times.get(key)
+            if times is None:
+                times = s.times[key] = deque()
+                if s.distinct_fn is not None:
+                    s.values[key] = deque()
+                    s.distinct[key] = Counter()
+            times.append(ts if not times or ts >= times[-1] else times[-1])
+            if s.distinct_fn is not None:
+                value = s.distinct_fn(record)
+                s.values[key].append(value)
+                s.distinct[key][value] += 1
+
+    @staticmethod
+    def _sweep(s: _Stream, now_ns: int) -> None:
+        cutoff = now_ns - s.window_ns
+        stale = [key for key, times in s.times.items() if times[-1] < cutoff]
+        for key in stale:
+            del s.times[key]
+            if s.distinct_fn is not None:
+                del s.values[key], s.distinct[key]
+        s.next_sweep_ns = now_ns + s.window_ns
+
+    def _evict(self, s: _Stream, key: Any, now_ns: int) -> Optional[deque]:
+        times = s.times.get(key)
+        if times is None:
+            return None
+        cutoff = now_ns - s.window_ns
+        if s.distinct_fn is None:
+            while times and times[0] < cutoff:
+                times.popleft()
+        else:
+            values, distinct = s.values[key], s.distinct[key]
+            while times and times[0] < cutoff:
+                times.popleft()
+                value = values.popleft()
+                distinct[value] -= 1
+                if distinct[value] <= 0:
+                    del distinct[value]
+        if not times:
+            del s.times[key]
+            if s.distinct_fn is not None:
+                del s.values[key], s.distinct[key]
+            return None
+        return times
+
+    def count(self, name: str, key: Any, now_ns: int, window_ns: Optional[int] = None) -> int:
+        s = self._streams[name]
+        times = self._evict(s, key, now_ns)
+        if times is None:
+            return 0
+        if window_ns is None or window_ns >= s.window_ns:
+            return len(times)
+        return len(times) - bisect_left(times, now_ns - window_ns)
+
+    def distinct(self, name: str, key: Any, now_ns: int) -> int:
+        return self.count_distinct(name, key, now_ns)[1]
+
+    def count_distinct(self, name: str, key: Any, now_ns: int) -> tuple[int, int]:
+        """
+        (events, distinct values) for one key with a single eviction pass.
+        The distinct count is the size of the live value Counter, kept
+        exact on add/evict, so no per-call set is built.
+        """
+        s = self._streams[name]
+        times = self._evict(s, key, now_ns)
+        if times is None:
+            return 0, 0
+        return len(times), len(s.distinct[key])
@@ -1,14 +1,24 @@
 from __future__ import annotations
 
-import json
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
 import uuid
-from dataclasses import dataclass, asdict, field
-from datetime import datetime, timezone, timedelta
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+import orjson
 
-@dataclass(frozen=True)
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True, slots=True)
 class Alert:
     """
     SIEM-style alert record.
@@ -32,44 +42,153 @@ class Alert:
     context: dict = field(default_factory=dict)
 
 
+# Field names resolved once; serialization builds a shallow dict from these
+# instead of asdict(), which deep-copies reasons/context on every alert.
+_ALERT_FIELDS = tuple(f.name for f in fields(Alert))
+
+
 class AlertDeduper:
     """
     Prevents spamming repeated alerts for the same signal.
 
     Keys can be (rule_id, host, user, src_ip).
+
+    Last-emit times are monotonic seconds kept in emit order, so expired
+    keys are dropped from the front as new ones arrive and the cache never
+    holds more than `max_entries` keys.
     """
-    def __init__(self, ttl_seconds: int = 300):
-        self.ttl = timedelta(seconds=ttl_seconds)
-        self._last_emit: dict[str, datetime] = {}
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 100_000):
+        self.ttl = float(ttl_seconds)
+        self.max_entries = max_entries
+        self._last_emit: OrderedDict[tuple[str, str, str, str], float] = OrderedDict()
 
-    def _key(self, rule_id: str, host: str, user: Optional[str], src_ip: Optional[str]) -> str:
-        return f"{rule_id}|{host}|{user or ''}|{src_ip or ''}"
+    def _key(self, rule_id: str, host: str, user: Optional[str], src_ip: Optional[str]) -> tuple[str, str, str, str]:
+        return (rule_id, host, user or "", src_ip or "")
 
     def should_emit(self, rule_id: str, host: str, user: Optional[str], src_ip: Optional[str]) -> bool:
-        now = datetime.now(timezone.utc)
+        now = time.monotonic()
         k = self._key(rule_id, host, user, src_ip)
         last = self._last_emit.get(k)
-        if last is None:
-            self._last_emit[k] = now
-            return True
-        if now - last >= self.ttl:
-            self._last_emit[k] = now
-            return True
-        return False
+        if last is not None and now - last < self.ttl:
+            return False
+
+        self._last_emit[k] = now
+        self._last_emit.move_to_end(k)
+        self._expire(now)
+        return True
+
+    def _expire(self, now: float) -> None:
+        cache = self._last_emit
+        while cache:
+            oldest = next(iter(cache.values()))
+            if now - oldest < self.ttl and len(cache) <= self.max_entries:
+                break
+            cache.popitem(last=False)
 
 
 class AlertSinkJSONL:
     """
     Append-only alert sink. Durable, local-first.
+
+    emit() only serializes and enqueues; a dedicated writer thread drains
+    the bounded queue and writes up to `batch_size` lines with a single
+    write()+fsync, so callers never wait on disk. When the queue is full
+    alerts are dropped rather than blocking: the total is kept in `dropped`
+    (the gateway reports it on /health) and a warning is logged at most
+    once per `drop_log_interval_seconds` with the drops since the last one.
     """
-    def __init__(self, out_file: str = "engine/out/alerts.jsonl"):
+    _STOP = object()
+
+    def __init__(
+        self,
+        out_file: str = "engine/out/alerts.jsonl",
+        batch_size: int = 256,
+        max_queue: int = 10_000,
+        drop_log_interval_seconds: float = 10.0,
+    ):
         self.path = Path(out_file)
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.drop_log_interval = drop_log_interval_seconds
+        self._drops_unlogged = 0
+        self._next_drop_log = 0.0
+
+        self._fh = self.path.open("ab", buffering=1 << 20)
+        self._q: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thr = threading.Thread(target=self._run, name="alert-sink", daemon=True)
+        self._thr.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _serialize(alert: Alert) -> bytes:
+        record = {name: getattr(alert, name) for name in _ALERT_FIELDS}
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
 
     def emit(self, alert: Alert) -> None:
-        record = asdict(alert)
-        with self.path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.emit_many((alert,))
+
+    def emit_many(self, alerts) -> None:
+        dropped = 0
+        for a in alerts:
+            try:
+                self._q.put_nowait(self._serialize(a))
+            except queue.Full:
+                dropped += 1
+        if dropped:
+            self._record_drops(dropped)
+
+    def _record_drops(self, n: int) -> None:
+        self.dropped += n
+        self._drops_unlogged += n
+        now = time.monotonic()
+        if now >= self._next_drop_log:
+            logger.warning(
+                "alert queue full: dropped %d alert(s) (%d since start)",
+                self._drops_unlogged, self.dropped,
+            )
+            self._drops_unlogged = 0
+            self._next_drop_log = now + self.drop_log_interval
+
+    def _run(self) -> None:
+        q = self._q
+        while True:
+            item = q.get()
+            batch: list[bytes] = []
+            stop = item is self._STOP
+            if not stop:
+                batch.append(item)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._fh.write(b"".join(batch))
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+            for _ in range(len(batch) + (1 if stop else 0)):
+                q.task_done()
+            if stop:
+                return
+
+    def flush(self) -> None:
+        """
+        Block until everything enqueued so far is on disk.
+        """
+        if self._thr.is_alive():
+            self._q.join()
+
+    def close(self) -> None:
+        if self._thr.is_alive():
+            self._q.put(self._STOP)
+            self._thr.join()
+        if not self._fh.closed:
+            self._fh.close()
 
 
 def build_alert(
@@ -85,14 +204,17 @@ def build_alert(
     first_seen_utc: Optional[str] = None,
     last_seen_utc: Optional[str] = None,
     count: Optional[int] = None,
+    now: Optional[datetime] = None,
 ) -> Alert:
+    if now is None:
+        now = datetime.now(timezone.utc)
     return Alert(
         alert_id=str(uuid.uuid4()),
         rule_id=rule_id,
         host=host,
         severity=severity,
         confidence=confidence,
-        created_time_utc=datetime.now(timezone.utc).isoformat(),
+        created_time_utc=now.isoformat(),
         user=user,
         src_ip=src_ip,
         first_seen_utc=first_seen_utc,
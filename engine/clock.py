@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_US = timedelta(microseconds=1)
+
+
+def to_ns(dt: datetime) -> int:
+    """
+    Exact UTC nanoseconds since epoch (no float rounding).
+    """
+    return ((dt - _EPOCH) // _ONE_US) * 1_000
+
+
+def from_ns(ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=ns // 1_000)
+
+
+def ns_to_iso(ns: int) -> str:
+    return from_ns(ns).isoformat()
@@ -1,11 +1,50 @@
 from __future__ import annotations
 
-from datetime import timedelta
-
-from engine.models import CorrelationDecision, EventRecord
+from typing import Iterable
+
+from engine.aggregator import WindowAggregator
+from engine.models import (
+    AUTH_LOGIN_FAILED,
+    AUTH_LOGIN_SUCCESS,
+    CorrelationDecision,
+    Decision,
+    EventRecord,
+    Reason,
+)
 from engine.store import RollingEventStore
 
 
+# Plain-int reason bits: accumulating into an int avoids an IntFlag object per |=.
+_STORM = int(Reason.INGEST_STORM)
+_BRUTE = int(Reason.BRUTE_FORCE)
+_SPRAY = int(Reason.PASSWORD_SPRAY)
+_SUCCESS = int(Reason.SUCCESS_AFTER_FAILURES)
+
+
+def _any(e: EventRecord) -> bool:
+    return True
+
+
+def _is_auth_fail(e: EventRecord) -> bool:
+    return e.code == AUTH_LOGIN_FAILED
+
+
+def _host_key(e: EventRecord) -> str:
+    return e.host
+
+
+def _host_user_key(e: EventRecord) -> tuple[str, str]:
+    return (e.host, e.user or "unknown")
+
+
+def _host_src_ip_key(e: EventRecord) -> tuple[str, str] | None:
+    return (e.host, e.src_ip) if e.src_ip else None
+
+
+def _user_of(e: EventRecord) -> str:
+    return e.user or "unknown"
+
+
 class Correlator:
     """
     SIEM-style correlation engine.
@@ -35,105 +74,105 @@ class Correlator:
     ):
         self.store = RollingEventStore(window_seconds=store_window_seconds)
 
-        self.storm_window = timedelta(seconds=storm_window_seconds)
+        self.storm_window_seconds = storm_window_seconds
+        self.storm_window_ns = storm_window_seconds * 1_000_000_000
         self.storm_threshold = storm_threshold
 
-        self.brute_window = timedelta(seconds=brute_window_seconds)
+        self.brute_window_seconds = brute_window_seconds
+        self.brute_window_ns = brute_window_seconds * 1_000_000_000
         self.brute_threshold = brute_threshold
 
-        self.spray_window = timedelta(seconds=spray_window_seconds)
+        self.spray_window_seconds = spray_window_seconds
+        self.spray_window_ns = spray_window_seconds * 1_000_000_000
         self.spray_unique_users_threshold = spray_unique_users_threshold
         self.spray_fail_threshold = spray_fail_threshold
 
-        self.success_window = timedelta(seconds=success_window_seconds)
+        self.success_window_seconds = success_window_seconds
+        self.success_window_ns = success_window_seconds * 1_000_000_000
         self.success_prior_fail_threshold = success_prior_fail_threshold
 
+        # Window aggregation is pushed into registered streams; evaluate()
+        # only reads precomputed counts. Brute force and success-after-failures
+        # share the login_failed stream, held for the longer of their windows.
+        self.windows = WindowAggregator()
+        self.windows.register("storm", _host_key, _any, storm_window_seconds)
+        self.windows.register(
+            "auth_fail", _host_user_key, _is_auth_fail,
+            max(brute_window_seconds, success_window_seconds),
+        )
+        self.windows.register(
+            "spray", _host_src_ip_key, _is_auth_fail, spray_window_seconds,
+            distinct_fn=_user_of,
+        )
+
     def evaluate(self, record: EventRecord) -> CorrelationDecision:
         self.store.add(record)
-        recent = self.store.get_recent(record.host)
-        now = record.received_time_utc
+        self.windows.add(record)
+        host = record.host
+        now = record.received_ns
+        user = record.user or "unknown"
+        src_ip = record.src_ip
 
-        reasons: list[str] = []
+        reasons = 0
         context: dict = {}
 
         # ---- Rule 1: Host event storm ----
-        storm_cutoff = now - self.storm_window
-        storm_count = sum(1 for e in recent if e.received_time_utc >= storm_cutoff)
+        storm_count = self.windows.count("storm", host, now)
         context["storm_count"] = storm_count
-        context["storm_window_seconds"] = int(self.storm_window.total_seconds())
+        context["storm_window_seconds"] = self.storm_window_seconds
         if storm_count > self.storm_threshold:
-            reasons.append("ingest_storm")
+            reasons |= _STORM
 
         # ---- Rule 2: Brute force (auth.login_failed burst per user) ----
-        brute_cutoff = now - self.brute_window
-        user = record.user or "unknown"
-        fail_events = [
-            e for e in recent
-            if e.received_time_utc >= brute_cutoff
-            and e.category == "auth"
-            and e.action == "login_failed"
-            and (e.user or "unknown") == user
-        ]
-        fail_count = len(fail_events)
+        fail_count = self.windows.count("auth_fail", (host, user), now, self.brute_window_ns)
         context["brute_user"] = user
         context["login_failed_count"] = fail_count
-        context["brute_window_seconds"] = int(self.brute_window.total_seconds())
+        context["brute_window_seconds"] = self.brute_window_seconds
         if fail_count >= self.brute_threshold:
-            reasons.append("brute_force_suspected")
+            reasons |= _BRUTE
 
         # ---- Rule 3: Password spray (same src_ip, many users failing) ----
-        spray_cutoff = now - self.spray_window
-        src_ip = record.src_ip
         if src_ip:
-            spray_fail_events = [
-                e for e in recent
-                if e.received_time_utc >= spray_cutoff
-                and e.category == "auth"
-                and e.action == "login_failed"
-                and e.src_ip == src_ip
-            ]
-            spray_fail_count = len(spray_fail_events)
-            spray_users = { (e.user or "unknown") for e in spray_fail_events }
-            unique_users = len(spray_users)
+            spray_fail_count, unique_users = self.windows.count_distinct("spray", (host, src_ip), now)
 
             context["spray_src_ip"] = src_ip
             context["spray_fail_count"] = spray_fail_count
             context["spray_unique_users"] = unique_users
-            context["spray_window_seconds"] = int(self.spray_window.total_seconds())
+            context["spray_window_seconds"] = self.spray_window_seconds
 
             if spray_fail_count >= self.spray_fail_threshold and unique_users >= self.spray_unique_users_threshold:
-                reasons.append("password_spray_suspected")
+                reasons |= _SPRAY
 
         # ---- Rule 4: Success after failures (potential compromise) ----
-        if record.category == "auth" and record.action == "login_success":
-            success_cutoff = now - self.success_window
-            prior_fail_events = [
-                e for e in recent
-                if e.received_time_utc >= success_cutoff
-                and e.category == "auth"
-                and e.action == "login_failed"
-                and (e.user or "unknown") == user
-            ]
-            prior_fails = len(prior_fail_events)
+        if record.code == AUTH_LOGIN_SUCCESS:
+            prior_fails = self.windows.count("auth_fail", (host, user), now, self.success_window_ns)
             context["success_user"] = user
             context["success_prior_fail_count"] = prior_fails
-            context["success_window_seconds"] = int(self.success_window.total_seconds())
+            context["success_window_seconds"] = self.success_window_seconds
             if prior_fails >= self.success_prior_fail_threshold:
-                reasons.append("success_after_failures")
+                reasons |= _SUCCESS
 
         # decision policy (simple + explainable)
-        decision = "ALLOW"
-        if "ingest_storm" in reasons and ("brute_force_suspected" in reasons or "password_spray_suspected" in reasons):
-            decision = "BLOCK"
+        decision = Decision.ALLOW
+        if reasons & _STORM and reasons & (_BRUTE | _SPRAY):
+            decision = Decision.BLOCK
         elif reasons:
-            decision = "THROTTLE"
+            decision = Decision.THROTTLE
 
-        context["recent_events_kept"] = len(recent)
+        context["recent_events_kept"] = self.store.count(host, now)
 
         return CorrelationDecision(
             event_id=record.event_id,
             host=record.host,
             decision=decision,
-            reasons=reasons,
+            reasons=Reason(reasons),
             context=context,
         )
+
+    def evaluate_many(self, records: Iterable[EventRecord]) -> list[CorrelationDecision]:
+        """
+        Evaluate records in arrival order; same result as calling evaluate()
+        on each, with one method lookup for the batch.
+        """
+        evaluate = self.evaluate
+        return [evaluate(r) for r in records]
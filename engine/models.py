@@ -2,16 +2,61 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Literal, Optional
+from enum import IntEnum, IntFlag
+from typing import Any, Mapping, Optional
 
+from engine.clock import to_ns
 
-DecisionType = Literal["ALLOW", "THROTTLE", "BLOCK"]
 
+class Decision(IntEnum):
+    ALLOW = 0
+    THROTTLE = 1
+    BLOCK = 2
 
-@dataclass(frozen=True)
+
+class Reason(IntFlag):
+    """
+    Correlation reasons as bits; names are only produced at the output boundary.
+    """
+    INGEST_STORM = 1
+    BRUTE_FORCE = 2
+    PASSWORD_SPRAY = 4
+    SUCCESS_AFTER_FAILURES = 8
+
+
+# Wire names, in the order reasons are reported.
+REASON_NAMES: dict[Reason, str] = {
+    Reason.INGEST_STORM: "ingest_storm",
+    Reason.BRUTE_FORCE: "brute_force_suspected",
+    Reason.PASSWORD_SPRAY: "password_spray_suspected",
+    Reason.SUCCESS_AFTER_FAILURES: "success_after_failures",
+}
+REASON_BY_NAME: dict[str, Reason] = {name: r for r, name in REASON_NAMES.items()}
+
+
+def reason_names(reasons: int) -> list[str]:
+    return [name for r, name in REASON_NAMES.items() if reasons & r]
+
+
+# Packed (category << 8 | action) codes for the event kinds rules test on;
+# anything else is 0. Rules compare one int instead of two strings.
+AUTH_LOGIN_FAILED = 0x0101
+AUTH_LOGIN_SUCCESS = 0x0102
+
+EVENT_CODES: dict[tuple[str, str], int] = {
+    ("auth", "login_failed"): AUTH_LOGIN_FAILED,
+    ("auth", "login_success"): AUTH_LOGIN_SUCCESS,
+}
+
+
+@dataclass(frozen=True, slots=True)
 class EventRecord:
     """
     Minimal internal representation for correlation & policy.
+
+    `code` (from category/action) and `received_ns` (int epoch ns of
+    received_time_utc) are derived once at construction; the hot path
+    compares these ints instead of strings and datetimes.
     """
     event_id: str
     source: str
@@ -25,20 +70,34 @@ class EventRecord:
     user: Optional[str] = None
     src_ip: Optional[str] = None
 
+    code: int = field(init=False, repr=False, compare=False)
+    received_ns: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "code", EVENT_CODES.get((self.category, self.action), 0))
+        object.__setattr__(self, "received_ns", to_ns(self.received_time_utc))
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CorrelationDecision:
     event_id: str
     host: str
-    decision: DecisionType
-    reasons: list[str] = field(default_factory=list)
+    decision: Decision
+    reasons: Reason = Reason(0)
     context: dict = field(default_factory=dict)
 
+    def reason_names(self) -> list[str]:
+        return reason_names(self.reasons)
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class PolicyDecision:
+    """
+    `reasons` and `context` may be shared, read-only objects (tuples,
+    MappingProxyType); copy before mutating.
+    """
     event_id: str
     host: str
-    decision: DecisionType
-    reasons: list[str] = field(default_factory=list)
-    context: dict = field(default_factory=dict)
+    decision: Decision
+    reasons: tuple[str, ...] = ()
+    context: Mapping[str, Any] = field(default_factory=dict)
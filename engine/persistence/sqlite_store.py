@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import atexit
 import os
 import sqlite3
+import threading
+import time
 from dataclasses import dataclass
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
 from typing import Optional
 
+from engine.clock import to_ns
+from engine.persistence.bloom import BloomFilter
 
-@dataclass(frozen=True)
+
+SCHEMA_VERSION = 1
+
+
+@dataclass(frozen=True, slots=True)
 class HostState:
     host: str
-    cooldown_until_utc: Optional[str]  # ISO8601
+    cooldown_until_ns: Optional[int]  # unix epoch nanoseconds (UTC)
     quarantine: bool
 
 
@@ -21,92 +30,253 @@ class SQLiteStore:
     - host policy state (cooldown, quarantine)
 
     Designed for local SIEM realism.
+
+    Two autocommit connections are opened for the store's lifetime (PRAGMAs
+    applied once) instead of reconnecting on every call: a writer, shared
+    across threads behind `_write_lock`, and a query-only reader behind its
+    own lock. Under WAL the reader never waits for a write transaction, so
+    idempo_seen and get_host_state stay cheap on the event loop while a
+    flush or GC runs in a worker thread.
+
+    A Bloom filter of every marked event_id sits in front of idempo_seen:
+    the common "never seen" answer is served from memory and only filter
+    hits are confirmed against SQLite.
+
+    Timestamps are stored as INTEGER unix-epoch nanoseconds; ISO strings
+    are only produced at the JSON boundary.
+
+    idempo_mark only buffers the id in memory behind a short-held lock;
+    flush() writes the buffer with one executemany per transaction, so one
+    commit covers many events. Ids being flushed stay visible to
+    idempo_seen until the commit lands. The owner must call flush() every
+    `flush_interval_seconds` and on shutdown (the gateway does so from a
+    worker thread); a crash then loses at most one interval of marks. A
+    mark only writes inline once `flush_rows` are pending, as backpressure
+    when the timer falls behind.
     """
 
-    def __init__(self, db_path: str = "engine/out/state.db"):
+    def __init__(
+        self,
+        db_path: str = "engine/out/state.db",
+        bloom_capacity: int = 1_000_000,
+        bloom_error_rate: float = 1e-4,
+        flush_rows: int = 500,
+        flush_interval_seconds: float = 0.05,
+    ):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._write_lock = threading.RLock()
+        self._read_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._conn = self._connect()
         self._init_db()
+        self._rconn = self._connect()
+        self._rconn.execute("PRAGMA query_only=ON;")
+        self._bloom = BloomFilter(capacity=bloom_capacity, error_rate=bloom_error_rate)
+        self._warm_bloom()
+
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_seconds
+        self._pending: dict[str, int] = {}
+        self._flushing: dict[str, int] = {}  # taken by the running flush
+        atexit.register(self.flush)
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute("PRAGMA synchronous=NORMAL;")
         return conn
 
+    def close(self) -> None:
+        with self._write_lock:
+            self.flush()
+            self._conn.close()
+        with self._read_lock:
+            self._rconn.close()
+
     def _init_db(self) -> None:
-        with self._connect() as conn:
+        with self._write_lock:
+            conn = self._conn
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                self._migrate_iso_to_ns(conn)
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS idempotency (
                     event_id TEXT PRIMARY KEY,
-                    first_seen_utc TEXT NOT NULL
+                    first_seen_ns INTEGER NOT NULL
                 )
                 """
             )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_idempo_time ON idempotency(first_seen_ns)"
+            )
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS host_policy (
                     host TEXT PRIMARY KEY,
-                    cooldown_until_utc TEXT NULL,
+                    cooldown_until_ns INTEGER NULL,
                     quarantine INTEGER NOT NULL DEFAULT 0,
-                    updated_utc TEXT NOT NULL
+                    updated_ns INTEGER NOT NULL
                 )
                 """
             )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @staticmethod
+    def _migrate_iso_to_ns(conn: sqlite3.Connection) -> None:
+        """
+        Rewrite pre-v1 tables (ISO8601 TEXT timestamps) with INTEGER ns columns.
+        """
+        def iso_ns(v: Optional[str]) -> Optional[int]:
+            return None if v is None else to_ns(datetime.fromisoformat(v))
+
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.execute("BEGIN")
+        try:
+            if "idempotency" in tables:
+                rows = conn.execute("SELECT event_id, first_seen_utc FROM idempotency").fetchall()
+                conn.execute("DROP TABLE idempotency")
+                conn.execute("CREATE TABLE idempotency (event_id TEXT PRIMARY KEY, first_seen_ns INTEGER NOT NULL)")
+                conn.executemany(
+                    "INSERT INTO idempotency(event_id, first_seen_ns) VALUES(?, ?)",
+                    [(eid, iso_ns(ts)) for eid, ts in rows],
+                )
+            if "host_policy" in tables:
+                rows = conn.execute(
+                    "SELECT host, cooldown_until_utc, quarantine, updated_utc FROM host_policy"
+                ).fetchall()
+                conn.execute("DROP TABLE host_policy")
+                conn.execute(
+                    """
+                    CREATE TABLE host_policy (
+                        host TEXT PRIMARY KEY,
+                        cooldown_until_ns INTEGER NULL,
+                        quarantine INTEGER NOT NULL DEFAULT 0,
+                        updated_ns INTEGER NOT NULL
+                    )
+                    """
+                )
+                conn.executemany(
+                    "INSERT INTO host_policy(host, cooldown_until_ns, quarantine, updated_ns) VALUES(?, ?, ?, ?)",
+                    [(h, iso_ns(c), q, iso_ns(u)) for h, c, q, u in rows],
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
 
     # --------------------
     # Idempotency
     # --------------------
+    def _warm_bloom(self) -> None:
+        with self._write_lock:
+            for (event_id,) in self._conn.execute("SELECT event_id FROM idempotency"):
+                self._bloom.add(event_id)
+
     def idempo_seen(self, event_id: str) -> bool:
-        with self._connect() as conn:
-            cur = conn.execute("SELECT 1 FROM idempotency WHERE event_id = ? LIMIT 1", (event_id,))
+        if event_id not in self._bloom:
+            return False
+        with self._pending_lock:
+            if event_id in self._pending or event_id in self._flushing:
+                return True
+        with self._read_lock:
+            cur = self._rconn.execute("SELECT 1 FROM idempotency WHERE event_id = ? LIMIT 1", (event_id,))
             return cur.fetchone() is not None
 
     def idempo_mark(self, event_id: str) -> None:
-        now = datetime.now(timezone.utc).isoformat()
-        with self._connect() as conn:
-            conn.execute(
-                "INSERT OR IGNORE INTO idempotency(event_id, first_seen_utc) VALUES(?, ?)",
-                (event_id, now),
-            )
+        now = time.time_ns()
+        with self._pending_lock:
+            self._pending.setdefault(event_id, now)
+            self._bloom.add(event_id)
+            full = len(self._pending) >= self.flush_rows
+        if full:
+            self.flush()
 
-    def idempo_gc(self, ttl_seconds: int) -> int:
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def flush(self) -> None:
+        """
+        Write all pending idempotency marks in a single transaction.
+
+        The buffer is swapped out under the pending lock, so marks and
+        idempo_seen never wait for the write itself.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return
+                rows, self._pending = self._pending, {}
+                self._flushing = rows
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO idempotency(event_id, first_seen_ns) VALUES(?, ?)",
+                    list(rows.items()),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                with self._pending_lock:
+                    for event_id, ts in rows.items():
+                        self._pending.setdefault(event_id, ts)
+                    self._flushing = {}
+                raise
+            with self._pending_lock:
+                self._flushing = {}
+
+    def idempo_gc(self, ttl_seconds: int, batch_rows: int = 1000) -> int:
         """
         Delete idempotency rows older than TTL. Returns number deleted.
+
+        Rows are deleted `batch_rows` at a time and the write lock is
+        released between batches, so a large backlog never holds up
+        flushes or host-state writes for long.
         """
-        cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl_seconds)
-        cutoff_iso = cutoff.isoformat()
-        with self._connect() as conn:
-            cur = conn.execute("DELETE FROM idempotency WHERE first_seen_utc < ?", (cutoff_iso,))
-            return cur.rowcount
+        cutoff = time.time_ns() - ttl_seconds * 1_000_000_000
+        deleted = 0
+        while True:
+            with self._write_lock:
+                cur = self._conn.execute(
+                    """
+                    DELETE FROM idempotency WHERE rowid IN (
+                        SELECT rowid FROM idempotency WHERE first_seen_ns < ? LIMIT ?
+                    )
+                    """,
+                    (cutoff, batch_rows),
+                )
+            deleted += cur.rowcount
+            if cur.rowcount < batch_rows:
+                return deleted
 
     # --------------------
     # Host policy state
     # --------------------
     def get_host_state(self, host: str) -> HostState:
-        with self._connect() as conn:
-            cur = conn.execute(
-                "SELECT cooldown_until_utc, quarantine FROM host_policy WHERE host = ?",
+        with self._read_lock:
+            cur = self._rconn.execute(
+                "SELECT cooldown_until_ns, quarantine FROM host_policy WHERE host = ?",
                 (host,),
             )
             row = cur.fetchone()
             if row is None:
-                return HostState(host=host, cooldown_until_utc=None, quarantine=False)
-            cooldown_until_utc, quarantine = row
-            return HostState(host=host, cooldown_until_utc=cooldown_until_utc, quarantine=bool(quarantine))
+                return HostState(host=host, cooldown_until_ns=None, quarantine=False)
+            cooldown_until_ns, quarantine = row
+            return HostState(host=host, cooldown_until_ns=cooldown_until_ns, quarantine=bool(quarantine))
 
-    def set_host_state(self, host: str, cooldown_until_utc: Optional[str], quarantine: bool) -> None:
-        now = datetime.now(timezone.utc).isoformat()
-        with self._connect() as conn:
-            conn.execute(
+    def set_host_state(self, host: str, cooldown_until_ns: Optional[int], quarantine: bool) -> None:
+        now = time.time_ns()
+        with self._write_lock:
+            self._conn.execute(
                 """
-                INSERT INTO host_policy(host, cooldown_until_utc, quarantine, updated_utc)
+                INSERT INTO host_policy(host, cooldown_until_ns, quarantine, updated_ns)
                 VALUES(?, ?, ?, ?)
                 ON CONFLICT(host) DO UPDATE SET
-                    cooldown_until_utc=excluded.cooldown_until_utc,
+                    cooldown_until_ns=excluded.cooldown_until_ns,
                     quarantine=excluded.quarantine,
-                    updated_utc=excluded.updated_utc
+                    updated_ns=excluded.updated_ns
                 """,
-                (host, cooldown_until_utc, 1 if quarantine else 0, now),
+                (host, cooldown_until_ns, 1 if quarantine else 0, now),
             )
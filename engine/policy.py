@@ -1,19 +1,69 @@
 from __future__ import annotations
 
+import time
+from collections import defaultdict
 from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
-from typing import Optional
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional, Sequence
 
-from engine.models import CorrelationDecision, EventRecord, PolicyDecision
+from engine.clock import ns_to_iso
+from engine.models import REASON_BY_NAME, CorrelationDecision, Decision, EventRecord, PolicyDecision, Reason
 
 from engine.persistence.sqlite_store import SQLiteStore
 
-@dataclass
+
+# Shared, immutable reason tuples: decisions reference these instead of
+# allocating a fresh list per event.
+_BELOW_FLOOR = ("below_severity_floor",)
+_QUARANTINED = ("host_quarantined",)
+_COOLDOWN_ACTIVE = ("cooldown_active",)
+_QUARANTINE_ACTIVATED = ("quarantine_activated",)
+_CORRELATION_BLOCK = ("correlation_block",)
+_COOLDOWN_SET = ("suspicious_cooldown_set",)
+_OK = ("ok",)
+
+# The correlation part of a policy context depends only on (correlation
+# decision, reason bits, severity), so one read-only mapping per combination
+# is built once and shared; branches that add keys copy it first.
+_BASE_CTX: dict[tuple[Decision, int, int], Mapping[str, Any]] = {}
+
+
+def _base_context(corr: CorrelationDecision, severity: int) -> Mapping[str, Any]:
+    key = (corr.decision, int(corr.reasons), severity)
+    ctx = _BASE_CTX.get(key)
+    if ctx is None:
+        ctx = _BASE_CTX[key] = MappingProxyType({
+            "correlation_decision": corr.decision.name,
+            "correlation_reasons": tuple(corr.reason_names()),
+            "severity": severity,
+        })
+    return ctx
+
+
+@dataclass(slots=True)
 class HostPolicyState:
-    cooldown_until_utc: Optional[datetime] = None
+    cooldown_until_ns: Optional[int] = None  # unix epoch nanoseconds (UTC)
     quarantine: bool = False
 
 
+# Side effect applied when a policy rule matches.
+_EFFECT_NONE = 0
+_EFFECT_SHOW_COOLDOWN = 1   # report the active cooldown in context
+_EFFECT_QUARANTINE = 2      # latch quarantine and persist
+_EFFECT_COOLDOWN = 3        # start a cooldown and persist
+
+# (when(severity, corr, state, now_ns), decision, reasons, effect, fires_on_allow)
+# fires_on_allow is False only for rules whose `when` requires a non-ALLOW
+# correlation decision; ALLOW events skip exactly those rules.
+PolicyRule = tuple[
+    Callable[[int, CorrelationDecision, HostPolicyState, int], bool],
+    Decision,
+    tuple[str, ...],
+    int,
+    bool,
+]
+
+
 class HostPolicyEngine:
     """
     SIEM response policy gate.
@@ -22,6 +72,11 @@ class HostPolicyEngine:
     - cooldown: temporary suppression window after high-confidence suspicion
     - quarantine: hard block mode (manual reset later)
     - severity floor: optionally ignore low severity
+
+    The ladder is built once in __init__ as an ordered rule table; evaluate
+    returns on the first matching rule, ALLOW if none match. Correlation
+    ALLOW events (the common case) walk the sub-table of rules flagged as
+    able to fire on ALLOW, so the table stays the only source of truth.
     """
 
     def __init__(
@@ -31,102 +86,108 @@ class HostPolicyEngine:
         severity_floor: int = 0,
         sqlite_store: SQLiteStore | None = None
     ):
-        self.cooldown = timedelta(seconds=cooldown_seconds)
-        self.quarantine_on = set(quarantine_on)
+        self.cooldown_ns = cooldown_seconds * 1_000_000_000
+        self.quarantine_on = Reason(0)
+        for name in quarantine_on:
+            self.quarantine_on |= REASON_BY_NAME[name]
         self.severity_floor = severity_floor
-        self._state: dict[str, HostPolicyState] = {}
+        self._state: defaultdict[str, HostPolicyState] = defaultdict(HostPolicyState)
         self.sqlite = sqlite_store
-
-
-    def evaluate(self, record: EventRecord, corr: CorrelationDecision) -> PolicyDecision:
+        self._rules = self._build_rules()
+        self._allow_rules = [rule for rule in self._rules if rule[4]]
+
+    def _build_rules(self) -> list[PolicyRule]:
+        floor = self.severity_floor
+        quarantine_on = self.quarantine_on
+        BLOCK, THROTTLE = Decision.BLOCK, Decision.THROTTLE
+        return [
+            # Severity gating (optional)
+            (lambda sev, corr, st, now: sev < floor,
+             THROTTLE, _BELOW_FLOOR, _EFFECT_NONE, True),
+            # Hard quarantine overrides everything
+            (lambda sev, corr, st, now: st.quarantine,
+             BLOCK, _QUARANTINED, _EFFECT_NONE, True),
+            # Cooldown active?
+            (lambda sev, corr, st, now: bool(st.cooldown_until_ns) and now < st.cooldown_until_ns,
+             BLOCK, _COOLDOWN_ACTIVE, _EFFECT_SHOW_COOLDOWN, True),
+            # Correlator BLOCK: escalate to quarantine if rule matches ...
+            (lambda sev, corr, st, now: corr.decision == BLOCK and bool(corr.reasons & quarantine_on),
+             BLOCK, _QUARANTINE_ACTIVATED, _EFFECT_QUARANTINE, False),
+            # ... otherwise just block with cooldown
+            (lambda sev, corr, st, now: corr.decision == BLOCK,
+             BLOCK, _CORRELATION_BLOCK, _EFFECT_COOLDOWN, False),
+            # Correlator THROTTLE: set cooldown but allow monitoring
+            (lambda sev, corr, st, now: corr.decision == THROTTLE,
+             THROTTLE, _COOLDOWN_SET, _EFFECT_COOLDOWN, False),
+        ]
+
+
+    def evaluate(self, record: EventRecord, corr: CorrelationDecision, now_ns: int | None = None) -> PolicyDecision:
+        """
+        `now_ns` lets the caller share one clock reading across the pipeline
+        (normally record.received_ns); falls back to the wall clock.
+        """
         host = record.host
-        st = self._state.get(host)
-        if st is None:
-            st = HostPolicyState()
-            self._state[host] = st
+        st = self._state[host]
 
         if self.sqlite is not None:
             persisted = self.sqlite.get_host_state(host)
-            if st is None:
-                st = HostPolicyState()
             # hydrate in-memory
             st.quarantine = persisted.quarantine
-            if persisted.cooldown_until_utc:
-                st.cooldown_until_utc = datetime.fromisoformat(persisted.cooldown_until_utc)
-            else:
-                st.cooldown_until_utc = None
-            self._state[host] = st
-
-
-        now = datetime.now(timezone.utc)
-
-        context = {
-            "correlation_decision": corr.decision,
-            "correlation_reasons": corr.reasons,
-            "severity": record.severity,
-        }
-
-        # Severity gating (optional)
-        if record.severity < self.severity_floor:
-            return PolicyDecision(record.event_id, host, "THROTTLE", reasons=["below_severity_floor"], context=context)
-
-        # Hard quarantine overrides everything
-        if st.quarantine:
-            return PolicyDecision(record.event_id, host, "BLOCK", reasons=["host_quarantined"], context=context)
-
-        # Cooldown active?
-        if st.cooldown_until_utc and now < st.cooldown_until_utc:
-            context["cooldown_until_utc"] = st.cooldown_until_utc.isoformat()
-            return PolicyDecision(record.event_id, host, "BLOCK", reasons=["cooldown_active"], context=context)
-
-        # If correlator BLOCK, treat as block
-        if corr.decision == "BLOCK":
-            # escalate to quarantine if rule matches
-            if any(r in self.quarantine_on for r in corr.reasons):
-                st.quarantine = True
-                # Update DB
-                if self.sqlite is not None:
-                    self.sqlite.set_host_state(
-                        host,
-                        None if st.cooldown_until_utc is None else st.cooldown_until_utc.isoformat(),
-                        st.quarantine,
-                    )
-                return PolicyDecision(record.event_id, host, "BLOCK", reasons=["quarantine_activated"], context=context)
-            # otherwise just block with cooldown
-            st.cooldown_until_utc = now + self.cooldown
-            context["cooldown_set_until_utc"] = st.cooldown_until_utc.isoformat()
-            # Update DB
-            if self.sqlite is not None:
-                self.sqlite.set_host_state(
-                    host,
-                    None if st.cooldown_until_utc is None else st.cooldown_until_utc.isoformat(),
-                    st.quarantine,
-                )
-
-            return PolicyDecision(record.event_id, host, "BLOCK", reasons=["correlation_block"], context=context)
-
-        # If correlator THROTTLE, set cooldown but allow monitoring
-        if corr.decision == "THROTTLE":
-            st.cooldown_until_utc = now + self.cooldown
-            context["cooldown_set_until_utc"] = st.cooldown_until_utc.isoformat()
-            # Update DB
-            if self.sqlite is not None:
-                self.sqlite.set_host_state(
-                    host,
-                    None if st.cooldown_until_utc is None else st.cooldown_until_utc.isoformat(),
-                    st.quarantine,
-                )
-            return PolicyDecision(record.event_id, host, "THROTTLE", reasons=["suspicious_cooldown_set"], context=context)
-
-        # Correlation ALLOW → policy ALLOW
-        return PolicyDecision(record.event_id, host, "ALLOW", reasons=["ok"], context=context)
+            st.cooldown_until_ns = persisted.cooldown_until_ns or None
+
+
+        if now_ns is None:
+            now_ns = time.time_ns()
+
+        eid = record.event_id
+        severity = record.severity
+        context = _base_context(corr, severity)
+
+        rules = self._allow_rules if corr.decision == Decision.ALLOW else self._rules
+        for when, outcome, reasons, effect, _ in rules:
+            if when(severity, corr, st, now_ns):
+                break
+        else:
+            # Correlation ALLOW → policy ALLOW
+            return PolicyDecision(eid, host, Decision.ALLOW, _OK, context)
+
+        if effect == _EFFECT_SHOW_COOLDOWN:
+            context = {**context, "cooldown_until_utc": ns_to_iso(st.cooldown_until_ns)}
+        elif effect == _EFFECT_QUARANTINE:
+            st.quarantine = True
+            self._persist(host, st)
+        elif effect == _EFFECT_COOLDOWN:
+            st.cooldown_until_ns = now_ns + self.cooldown_ns
+            context = {**context, "cooldown_set_until_utc": ns_to_iso(st.cooldown_until_ns)}
+            self._persist(host, st)
+        return PolicyDecision(eid, host, outcome, reasons, context)
+
+    def evaluate_many(
+        self,
+        records: Sequence[EventRecord],
+        corrs: Sequence[CorrelationDecision],
+        now_ns: int | None = None,
+    ) -> list[PolicyDecision]:
+        """
+        Evaluate (record, correlation) pairs in order. Without `now_ns`, each
+        record is judged at its own received_ns.
+        """
+        evaluate = self.evaluate
+        if now_ns is None:
+            return [evaluate(r, c, r.received_ns) for r, c in zip(records, corrs)]
+        return [evaluate(r, c, now_ns) for r, c in zip(records, corrs)]
+
+    def _persist(self, host: str, st: HostPolicyState) -> None:
+        if self.sqlite is not None:
+            self.sqlite.set_host_state(host, st.cooldown_until_ns, st.quarantine)
 
     def get_state(self, host: str) -> dict:
         if self.sqlite is not None:
             st = self.sqlite.get_host_state(host)
             return {
                 "host": host,
-                "cooldown_until_utc": st.cooldown_until_utc,
+                "cooldown_until_utc": None if st.cooldown_until_ns is None else ns_to_iso(st.cooldown_until_ns),
                 "quarantine": bool(st.quarantine),
             }
         st = self._state.get(host)
@@ -134,7 +195,7 @@ class HostPolicyEngine:
             return {"host": host, "cooldown_until_utc": None, "quarantine": False}
         return {
             "host": host,
-            "cooldown_until_utc": None if st.cooldown_until_utc is None else st.cooldown_until_utc.isoformat(),
+            "cooldown_until_utc": None if st.cooldown_until_ns is None else ns_to_iso(st.cooldown_until_ns),
             "quarantine": bool(st.quarantine),
         }
 
@@ -1,37 +1,59 @@
 from __future__ import annotations
 
+import time
 from collections import deque
-from datetime import datetime, timedelta, timezone
-from typing import Deque, Dict
+from typing import Deque, Dict, Optional
 
 from engine.models import EventRecord
 
 
 class RollingEventStore:
     """
-    In-memory rolling event store keyed by host.
+    In-memory rolling per-host event counts.
+
+    Only receive timestamps (int ns) are kept, one deque per host: the
+    store answers "how many events in the window", so it never holds on
+    to the records themselves. Timestamps are clamped to be non-decreasing
+    per host (records can arrive slightly out of order), so eviction only
+    ever looks at the front. Hosts that stop sending are dropped by a sweep
+    that runs from add() once per window.
     """
     def __init__(self, window_seconds: int):
-        self.window = timedelta(seconds=window_seconds)
-        self._events: Dict[str, Deque[EventRecord]] = {}
+        self.window_ns = window_seconds * 1_000_000_000
+        self._hosts: Dict[str, Deque[int]] = {}
+        self._next_sweep_ns = 0
 
     def add(self, record: EventRecord) -> None:
-        q = self._events.get(record.host)
-        if q is None:
-            q = deque()
-            self._events[record.host] = q
-
-        q.append(record)
-        self._cleanup_queue(q, now=record.received_time_utc)
-
-    def get_recent(self, host: str) -> list[EventRecord]:
-        q = self._events.get(host)
-        if not q:
-            return []
-        self._cleanup_queue(q, now=datetime.now(timezone.utc))
-        return list(q)
-
-    def _cleanup_queue(self, q: Deque[EventRecord], now: datetime) -> None:
-        cutoff = now - self.window
-        while q and q[0].received_time_utc < cutoff:
-            q.popleft()
+        now_ns = record.received_ns
+        if now_ns >= self._next_sweep_ns:
+            self._sweep(now_ns)
+
+        ts = self._hosts.get(record.host)
+        if ts is None:
+            ts = self._hosts[record.host] = deque()
+        if ts and now_ns < ts[-1]:
+            now_ns = ts[-1]
+        ts.append(now_ns)
+        self._cleanup(ts, now_ns=now_ns)
+
+    def count(self, host: str, now_ns: Optional[int] = None) -> int:
+        ts = self._hosts.get(host)
+        if ts is None:
+            return 0
+        self._cleanup(ts, now_ns=time.time_ns() if now_ns is None else now_ns)
+        if not ts:
+            del self._hosts[host]
+            return 0
+        return len(ts)
+
+    def _sweep(self, now_ns: int) -> None:
+        cutoff = now_ns - self.window_ns
+        stale = [host for host, ts in self._hosts.items() if ts[-1] < cutoff]
+        for host in stale:
+            del self._hosts[host]
+        self._next_sweep_ns = now_ns + self.window_ns
+
+    def _cleanup(self, ts: Deque[int], now_ns: int) -> None:
+        cutoff = now_ns - self.window_ns
+        while ts and ts[0] < cutoff:
+            ts.popleft()
@@ -1,23 +1,125 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import atexit
+import os
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
+
+import orjson
 
 
 class AuditLogger:
     """
     Append-only JSONL logger.
     MVP assumes single-process local dev; later we can add rotation/locking.
+
+    The file is opened once. After start() (FastAPI lifespan) write() only
+    serializes and enqueues; a drain task on the event loop appends up to
+    `batch_size` queued lines with a single write. Before start(), e.g. in
+    scripts, lines are written straight through. write() must be called
+    from the event loop thread.
+
+    `fsync_every_n` > 0 fsyncs once at least that many records have been
+    written since the last sync; 0 leaves flushing to the OS.
+
+    Output goes through a raw O_APPEND descriptor; each chunk is written
+    completely under a lock, so chunks never interleave.
     """
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, batch_size: int = 512, fsync_every_n: int = 0):
         self.path = Path(file_path)
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.fsync_every_n = fsync_every_n
+        self._unsynced = 0
+
+        self._fd: Optional[int] = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+        self._q: Optional[asyncio.Queue[bytes]] = None  # serialized lines (one or more)
+        self._task: Optional[asyncio.Task] = None
+
+    def write(self, record: dict[str, Any], now: Optional[datetime] = None) -> None:
+        record.setdefault("received_time_utc", now or datetime.now(timezone.utc))
+
+        # orjson renders datetimes as ISO 8601 itself; naive ones are taken as UTC.
+        line = orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NAIVE_UTC)
+        if self._q is None:
+            self._write(line)
+        else:
+            self._q.put_nowait(line)
+
+    def write_many(self, records: Iterable[dict[str, Any]], now: Optional[datetime] = None) -> None:
+        """
+        Serialize several records into one chunk: one queue item, one write.
+        """
+        if now is None:
+            now = datetime.now(timezone.utc)
+        opts = orjson.OPT_APPEND_NEWLINE | orjson.OPT_NAIVE_UTC
+        lines = []
+        for record in records:
+            record.setdefault("received_time_utc", now)
+            lines.append(orjson.dumps(record, option=opts))
+        if not lines:
+            return
+        chunk = b"".join(lines)
+        if self._q is None:
+            self._write(chunk)
+        else:
+            self._q.put_nowait(chunk)
+
+    def _write(self, chunk: bytes) -> None:
+        with self._lock:
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(self._fd, view):]
+            if self.fsync_every_n > 0:
+                # one record per line; orjson escapes newlines inside strings
+                self._unsynced += chunk.count(b"\n")
+                if self._unsynced >= self.fsync_every_n:
+                    os.fsync(self._fd)
+                    self._unsynced = 0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._q = asyncio.Queue()
+        self._task = asyncio.create_task(self._drain(), name="audit-drain")
+
+    async def _drain(self) -> None:
+        q = self._q
+        while True:
+            batch = [await q.get()]
+            while len(batch) < self.batch_size and not q.empty():
+                batch.append(q.get_nowait())
+            try:
+                self._write(b"".join(batch))
+            finally:
+                for _ in batch:
+                    q.task_done()
 
-    def write(self, record: dict[str, Any]) -> None:
-        record.setdefault("received_time_utc", datetime.now(timezone.utc).isoformat())
+    async def stop(self) -> None:
+        """
+        Drain everything queued so far, then fall back to direct writes.
+        """
+        if self._task is None:
+            return
+        await self._q.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._q = None
 
-        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
-        with self.path.open("a", encoding="utf-8") as f:
-            f.write(line + "\n")
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is None:
+                return
+            if self._unsynced:
+                os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
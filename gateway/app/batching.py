@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Callable, Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Funnels per-request work through one consumer task so that concurrent
+    requests are processed together.
+
+    submit() enqueues an item and awaits its result. Once the first item
+    arrives, the drain task takes whatever else is already queued (up to
+    `max_batch`) and hands the list to `process`, which must return one
+    result per item, in order. It never waits for a batch to fill, so an
+    idle gateway adds no latency. Items are processed in submit order.
+
+    Before start() (e.g. scripts without the app lifespan), submit()
+    processes its item inline.
+    """
+    def __init__(self, process: Callable[[list[T]], list[R]], max_batch: int = 64):
+        self.process = process
+        self.max_batch = max_batch
+        self._q: Optional[asyncio.Queue[tuple[T, asyncio.Future]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, item: T) -> R:
+        if self._q is None:
+            return self.process([item])[0]
+        fut = asyncio.get_running_loop().create_future()
+        self._q.put_nowait((item, fut))
+        return await fut
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._q = asyncio.Queue()
+        self._task = asyncio.create_task(self._drain(), name="ingest-batcher")
+
+    async def _drain(self) -> None:
+        q = self._q
+        while True:
+            batch = [await q.get()]
+            while len(batch) < self.max_batch and not q.empty():
+                batch.append(q.get_nowait())
+            try:
+                results = self.process([item for item, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for (_, fut), result in zip(batch, results):
+                    if not fut.done():  # caller may have gone away
+                        fut.set_result(result)
+            finally:
+                for _ in batch:
+                    q.task_done()
+
+    async def stop(self) -> None:
+        """
+        Finish everything queued so far, then fall back to inline processing.
+        """
+        if self._task is None:
+            return
+        await self._q.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._q = None
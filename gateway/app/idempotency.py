@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+import time
+from collections import OrderedDict
 from typing import Optional
 
 
@@ -9,28 +10,42 @@ from engine.persistence.sqlite_store import SQLiteStore
 
 
 class IdempotencyStore:
+    """
+    In-memory mode keeps event_id -> expiry in mark order. With a fixed TTL
+    that is also expiry order, so _gc only pops expired ids off the front
+    instead of scanning every entry.
+
+    Expiries are time.monotonic_ns() values: plain int compares, and immune
+    to wall-clock steps. `now_ns` must come from the same clock.
+    """
     def __init__(self, ttl_seconds: int, sqlite_store: Optional["SQLiteStore"] = None):
-        self.ttl = timedelta(seconds=ttl_seconds)
-        self._seen: dict[str, datetime] = {}
+        self.ttl_ns = ttl_seconds * 1_000_000_000
+        self._seen: OrderedDict[str, int] = OrderedDict()
         self.sqlite = sqlite_store
 
-    def seen(self, event_id: str) -> bool:
+    def seen(self, event_id: str, now_ns: Optional[int] = None) -> bool:
         if self.sqlite is not None:
             return self.sqlite.idempo_seen(event_id)
 
-        self._gc()
+        self._gc(now_ns)
         return event_id in self._seen
 
-    def mark(self, event_id: str) -> None:
+    def mark(self, event_id: str, now_ns: Optional[int] = None) -> None:
         if self.sqlite is not None:
             self.sqlite.idempo_mark(event_id)
             return
 
-        self._seen[event_id] = datetime.now(timezone.utc)
-
-    def _gc(self) -> None:
-        now = datetime.now(timezone.utc)
-        cutoff = now - self.ttl
-        dead = [k for k, t in self._seen.items() if t < cutoff]
-        for k in dead:
-            self._seen.pop(k, None)
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        self._seen[event_id] = now_ns + self.ttl_ns
+        self._seen.move_to_end(event_id)
+
+    def _gc(self, now_ns: Optional[int] = None) -> None:
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        seen = self._seen
+        while seen:
+            expires = next(iter(seen.values()))
+            if expires >= now_ns:
+                break
+            seen.popitem(last=False)
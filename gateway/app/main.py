@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import os
-from datetime import datetime, timezone
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
 
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
 
 from gateway.app.audit import AuditLogger
+from gateway.app.batching import MicroBatcher
 from gateway.app.idempotency import IdempotencyStore
 from gateway.app.models import SecurityEventV1
 from gateway.app.rate_limit import FixedWindowRateLimiter
@@ -15,20 +20,63 @@ from gateway.app.security import (
     SIG_HEADER,
     check_replay_window,
     get_shared_secret,
+    hmac_sha256_final,
+    hmac_sha256_inner,
     sha256_hex,
     verify_signature,
 )
 
 from engine.correlator import Correlator
-from engine.models import EventRecord
+from engine.models import REASON_NAMES, EventRecord, Reason
 from engine.policy import HostPolicyEngine
 
 from engine.alert import AlertDeduper, AlertSinkJSONL, build_alert
+from engine.clock import from_ns
 from pathlib import Path
 
 from engine.persistence.sqlite_store import SQLiteStore
 
-app = FastAPI(title="secure-event-correlator", version="0.3.0")
+
+async def _idempo_gc_loop(interval_seconds: float = 60.0) -> None:
+    # Expired idempotency rows are pruned here, off the request path.
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await asyncio.to_thread(sqlite.idempo_gc, ttl_seconds=IDEMPO_TTL_SECONDS)
+
+
+async def _idempo_flush_loop() -> None:
+    # Marks only buffer in memory; the write runs here, in a worker thread,
+    # so requests never wait on the transaction.
+    while True:
+        await asyncio.sleep(sqlite.flush_interval)
+        if sqlite.has_pending():
+            await asyncio.to_thread(sqlite.flush)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await audit.start()
+    await ingest_batcher.start()
+    tasks = []
+    if sqlite is not None:
+        tasks.append(asyncio.create_task(_idempo_gc_loop(), name="idempo-gc"))
+        tasks.append(asyncio.create_task(_idempo_flush_loop(), name="idempo-flush"))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await ingest_batcher.stop()
+        if sqlite is not None:
+            sqlite.flush()
+        await audit.stop()
+
+
+app = FastAPI(title="secure-event-correlator", version="0.3.0", lifespan=lifespan)
 
 # Last day - persistence using sqlite
 sqlite = None
@@ -37,8 +85,12 @@ if os.getenv("SEC_USE_SQLITE", "1") == "1":
 
 
 # ---- singletons (MVP in-memory) ----
-audit = AuditLogger(file_path="gateway/audit/audit.jsonl")
-idempo = IdempotencyStore(ttl_seconds=7 * 24 * 3600, sqlite_store=sqlite)
+audit = AuditLogger(
+    file_path="gateway/audit/audit.jsonl",
+    fsync_every_n=int(os.getenv("SEC_AUDIT_FSYNC_EVERY_N", "0")),
+)
+IDEMPO_TTL_SECONDS = 7 * 24 * 3600
+idempo = IdempotencyStore(ttl_seconds=IDEMPO_TTL_SECONDS, sqlite_store=sqlite)
 
 correlator = Correlator()
 policy_engine = HostPolicyEngine(
@@ -55,154 +107,268 @@ alert_deduper = AlertDeduper(ttl_seconds=int(os.getenv("SEC_ALERT_DEDUP_SECONDS"
 REPLAY_WINDOW_SECONDS = int(os.getenv("SEC_REPLAY_WINDOW_SECONDS", "120"))
 RATE_LIMIT_PER_MIN = int(os.getenv("SEC_RATE_LIMIT_PER_MIN", "300"))
 rate_limiter = FixedWindowRateLimiter(limit=RATE_LIMIT_PER_MIN, window_seconds=60)
+# Per client IP, checked before the body is read so a flood is shed without
+# reading or hashing it. Off by default (0): every host behind one forwarder
+# or proxy shares a single client IP, and with it a single budget.
+IP_RATE_LIMIT_PER_MIN = int(os.getenv("SEC_IP_RATE_LIMIT_PER_MIN", "0"))
+ip_rate_limiter = FixedWindowRateLimiter(
+    limit=IP_RATE_LIMIT_PER_MIN, window_seconds=60, reason="ip_rate_limited"
+)
+
+
+# Alert rule per correlation reason, indexed by the reason's bit position
+# (entry i is Reason 1 << i): (rule_id, severity, confidence, wire name).
+_RULE_BY_BIT: tuple[tuple[str, int, float, str], ...] = (
+    ("INGEST_STORM_V1", 5, 0.60, REASON_NAMES[Reason.INGEST_STORM]),
+    ("BRUTE_FORCE_V1", 7, 0.75, REASON_NAMES[Reason.BRUTE_FORCE]),
+    ("PASSWORD_SPRAY_V1", 8, 0.80, REASON_NAMES[Reason.PASSWORD_SPRAY]),
+    ("SUCCESS_AFTER_FAILURES_V1", 8, 0.70, REASON_NAMES[Reason.SUCCESS_AFTER_FAILURES]),
+)
+
+
+def _process_ingest_batch(items: list[tuple[EventRecord, str]]) -> list[tuple[dict, dict]]:
+    """
+    Correlate, decide, alert and audit a batch of accepted events in arrival
+    order. Returns the response "correlation" and "policy" objects per event.
+    """
+    records = [record for record, _ in items]
+    corrs = correlator.evaluate_many(records)
+    policies = policy_engine.evaluate_many(records, corrs)
+
+    alerts = []
+    audit_batch = []
+    results = []
+    for (record, client_ip), corr, policy in zip(items, corrs, policies):
+        now = record.received_time_utc
+
+        # ---- Alert emission (deduped) ----
+        reasons = int(corr.reasons)
+        if reasons:
+            host, user, src_ip, ctx = record.host, record.user, record.src_ip, corr.context
+            # walk the set bits lowest first, i.e. in REASON_NAMES order
+            while reasons:
+                low = reasons & -reasons
+                reasons ^= low
+                rule_id, sev, conf, name = _RULE_BY_BIT[low.bit_length() - 1]
+                if not alert_deduper.should_emit(rule_id, host, user, src_ip):
+                    continue
+                alert = build_alert(
+                    rule_id=rule_id,
+                    host=host,
+                    severity=sev,
+                    confidence=conf,
+                    user=user,
+                    src_ip=src_ip,
+                    reasons=[name],
+                    context=ctx,
+                    now=now,
+                )
+                alerts.append(alert)
+                audit_batch.append({
+                    "type": "alert_emitted",
+                    "alert_id": alert.alert_id,
+                    "rule_id": alert.rule_id,
+                    "host": alert.host,
+                    "severity": alert.severity,
+                    "confidence": alert.confidence,
+                    "reasons": alert.reasons,
+                    "received_time_utc": now,
+                })
+
+        correlation = {
+            "decision": corr.decision.name,
+            "reasons": corr.reason_names(),
+            "context": corr.context,
+        }
+        policy_out = {
+            "decision": policy.decision.name,
+            "reasons": policy.reasons,
+            "context": dict(policy.context),  # may be a shared read-only mapping
+        }
+
+        # 8) Audit accept + decisions (one record; sub-decisions nested)
+        audit_batch.append({
+            "type": "gateway_accept",
+            "path": "/ingest",
+            "client_ip": client_ip,
+            "verification_status": "pass",
+            "verification_reason": "ok",
+            "event_id": record.event_id,
+            "host": record.host,
+            "source": record.source,
+            "category": record.category,
+            "action": record.action,
+            "severity": record.severity,
+            "correlation": correlation,
+            "policy": policy_out,
+            "received_time_utc": now,
+        })
+        results.append((correlation, policy_out))
+
+    alert_sink.emit_many(alerts)
+    audit.write_many(audit_batch)
+    return results
+
+
+ingest_batcher: MicroBatcher[tuple[EventRecord, str], tuple[dict, dict]] = MicroBatcher(
+    _process_ingest_batch, max_batch=64
+)
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "service": "secure-event-correlator"}
+    return {"status": "ok", "service": "secure-event-correlator", "alerts_dropped": alert_sink.dropped}
 
 @app.get("/alerts/recent")
-def alerts_recent(limit: int = 50):
-    limit = max(1, min(limit, 200))
+def alerts_recent(limit: int = Query(50, ge=1, le=200)):
     path = Path("engine/out/alerts.jsonl")
     if not path.exists():
         return {"alerts": []}
 
-    # tail last N lines (simple local approach)
-    lines: list[str] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            if line.strip():
-                lines.append(line)
-
-    tail = lines[-limit:]
     alerts = []
-    for line in tail:
+    for line in _tail_lines(path, limit):
         try:
-            alerts.append(json.loads(line))
-        except Exception:
+            alerts.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
             continue
     return {"alerts": alerts}
 
 
+def _tail_lines(path: Path, n: int, block: int = 65536) -> list[bytes]:
+    """
+    Last `n` non-blank lines of a file, oldest first, read backwards in
+    `block`-sized chunks so only the tail of the file is touched.
+    """
+    lines: list[bytes] = []
+    with path.open("rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        partial = b""
+        while pos > 0 and len(lines) < n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            parts = (f.read(step) + partial).split(b"\n")
+            # the first piece may continue in the previous block
+            partial = parts.pop(0) if pos > 0 else b""
+            lines[:0] = [line for line in parts if line.strip()]
+    return lines[-n:]
+
+
+# Constant part of each gateway_reject audit record, built once per reason.
+_REJECT_TMPL: dict[str, dict] = {}
+
+
+def _reject_template(reason: str) -> dict:
+    tmpl = _REJECT_TMPL.get(reason)
+    if tmpl is None:
+        tmpl = _REJECT_TMPL[reason] = {
+            "type": "gateway_reject",
+            "path": "/ingest",
+            "verification_status": "fail",
+            "verification_reason": reason,
+        }
+    return tmpl
+
+
+def _reject(
+    status_code: int,
+    reason: str,
+    client_ip: str,
+    raw: bytes | None,
+    now: datetime,
+    event: SecurityEventV1 | None = None,
+    **extra,
+) -> HTTPException:
+    """
+    Audit a gateway_reject for `reason` and return the HTTPException to raise.
+    The body is only hashed here, so accepted requests skip that pass;
+    `raw=None` (body never read) leaves body_sha256 out of the record.
+    """
+    record = _reject_template(reason) | {"client_ip": client_ip}
+    if raw is not None:
+        record["body_sha256"] = sha256_hex(raw)
+    if event is not None:
+        record["event_id"] = event.event_id
+        record["host"] = event.host
+        record["source"] = event.source
+    if extra:
+        record.update(extra)
+    audit.write(record, now=now)
+    return HTTPException(status_code=status_code, detail=reason)
+
+
+async def _read_signed_body(request: Request, secret: bytes) -> tuple[bytes, bytes]:
+    """
+    Read the request body, feeding each chunk into the HMAC inner hash as it
+    arrives, so the MAC is ready once the last byte is in. Returns (body, mac).
+    """
+    inner = hmac_sha256_inner(secret)
+    chunks = []
+    async for chunk in request.stream():
+        if chunk:
+            inner.update(chunk)
+            chunks.append(chunk)
+    return b"".join(chunks), hmac_sha256_final(secret, inner)
+
+
 @app.post("/ingest")
 async def ingest(request: Request):
     client_ip = request.client.host if request.client else "unknown"
-    raw = await request.body()
-    body_hash = sha256_hex(raw)
-
-    # 1) HMAC auth on raw bytes (SIEM local-friendly)
+    # One reading per clock for the whole request: wall time for the audit,
+    # replay and rate-limit checks, monotonic time for idempotency expiry.
+    now_ns = time.time_ns()
+    now = from_ns(now_ns)
+    mono_ns = time.monotonic_ns()
+
+    # 0) Per-client rate limit, ahead of reading the body: unauthenticated
+    # traffic can use up a client's budget, but a shed request is neither
+    # read nor hashed. The per-host limit (step 5) still applies to verified events.
+    if IP_RATE_LIMIT_PER_MIN > 0:
+        ok, reason = ip_rate_limiter.allow(client_ip, now_ns)
+        if not ok:
+            raise _reject(429, reason, client_ip, None, now)
+
+    # 1) HMAC auth on raw bytes (SIEM local-friendly), hashed while the body streams in
     sig_header = request.headers.get(SIG_HEADER)
     if not sig_header:
-        audit.write({
-            "type": "gateway_reject",
-            "path": "/ingest",
-            "client_ip": client_ip,
-            "verification_status": "fail",
-            "verification_reason": "missing_signature",
-            "body_sha256": body_hash,
-        })
-        raise HTTPException(status_code=401, detail="missing_signature")
+        raise _reject(401, "missing_signature", client_ip, await request.body(), now)
 
     try:
         secret = get_shared_secret()
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    ok, reason = verify_signature(secret, raw, sig_header)
+    raw, mac = await _read_signed_body(request, secret)
+    ok, reason = verify_signature(secret, raw, sig_header, expected=mac)
     if not ok:
-        audit.write({
-            "type": "gateway_reject",
-            "path": "/ingest",
-            "client_ip": client_ip,
-            "verification_status": "fail",
-            "verification_reason": reason,
-            "body_sha256": body_hash,
-        })
-        raise HTTPException(status_code=401, detail=reason)
+        raise _reject(401, reason, client_ip, raw, now)
 
-    # 2) Parse + schema validate
+    # 2) Parse + schema validate (single pass over the raw bytes)
     try:
-        payload = json.loads(raw.decode("utf-8"))
-    except Exception:
-        audit.write({
-            "type": "gateway_reject",
-            "path": "/ingest",
-            "client_ip": client_ip,
-            "verification_status": "fail",
-            "verification_reason": "invalid_json",
-            "body_sha256": body_hash,
-        })
-        raise HTTPException(status_code=400, detail="invalid_json")
-
-    try:
-        event = SecurityEventV1.model_validate(payload)
-    except Exception as e:
-        audit.write({
-            "type": "gateway_reject",
-            "path": "/ingest",
-            "client_ip": client_ip,
-            "verification_status": "fail",
-            "verification_reason": "schema_validation_failed",
-            "body_sha256": body_hash,
-            "error": str(e),
-        })
-        raise HTTPException(status_code=400, detail="schema_validation_failed")
+        event = SecurityEventV1.model_validate_json(raw)
+    except ValidationError as e:
+        if e.errors()[0]["type"] == "json_invalid":
+            raise _reject(400, "invalid_json", client_ip, raw, now)
+        raise _reject(400, "schema_validation_failed", client_ip, raw, now, error=str(e))
 
     # 3) Anti-replay (timestamp_utc)
-    ok, reason = check_replay_window(event.timestamp_utc, REPLAY_WINDOW_SECONDS)
+    ok, reason = check_replay_window(
+        event.timestamp_utc.timestamp(), REPLAY_WINDOW_SECONDS, now=now_ns / 1_000_000_000
+    )
     if not ok:
-        audit.write({
-            "type": "gateway_reject",
-            "path": "/ingest",
-            "client_ip": client_ip,
-            "verification_status": "fail",
-            "verification_reason": reason,
-            "body_sha256": body_hash,
-            "event_id": event.event_id,
-            "host": event.host,
-            "source": event.source,
-        })
-        raise HTTPException(status_code=400, detail=reason)
+        raise _reject(400, reason, client_ip, raw, now, event=event)
 
     # 4) Idempotency
-    if idempo.seen(event.event_id):
-        audit.write({
-            "type": "gateway_reject",
-            "path": "/ingest",
-            "client_ip": client_ip,
-            "verification_status": "fail",
-            "verification_reason": "duplicate_event_id",
-            "body_sha256": body_hash,
-            "event_id": event.event_id,
-            "host": event.host,
-            "source": event.source,
-        })
-        raise HTTPException(status_code=409, detail="duplicate_event_id")
+    if idempo.seen(event.event_id, mono_ns):
+        raise _reject(409, "duplicate_event_id", client_ip, raw, now, event=event)
 
     # 5) Rate limit (per host)
-    ok, reason = rate_limiter.allow(event.host)
+    ok, reason = rate_limiter.allow(event.host, now_ns)
     if not ok:
-        audit.write({
-            "type": "gateway_reject",
-            "path": "/ingest",
-            "client_ip": client_ip,
-            "verification_status": "fail",
-            "verification_reason": reason,
-            "body_sha256": body_hash,
-            "event_id": event.event_id,
-            "host": event.host,
-            "source": event.source,
-        })
-        raise HTTPException(status_code=429, detail=reason)
+        raise _reject(429, reason, client_ip, raw, now, event=event)
 
     # Mark idempotency AFTER checks pass
-    idempo.mark(event.event_id)
-
-    # optional: opportunistic GC
-    if sqlite is not None:
-        sqlite.idempo_gc(ttl_seconds=7 * 24 * 3600)
-
+    idempo.mark(event.event_id, mono_ns)
 
     # 6) Normalize into internal record
     record = EventRecord(
@@ -213,101 +379,21 @@ async def ingest(request: Request):
         action=event.action,
         severity=event.severity,
         timestamp_utc=event.timestamp_utc,
-        received_time_utc=datetime.now(timezone.utc),
+        received_time_utc=now,
         user=event.user,
         src_ip=event.src_ip,
     )
 
-    # 7) Correlation + Policy
-    corr = correlator.evaluate(record)
-    policy = policy_engine.evaluate(record, corr)
-    final_decision = policy.decision
-
-    # ---- Alert emission (deduped) ----
-    # Map correlation reasons to alert rules
-    reason_to_rule = {
-        "brute_force_suspected": ("BRUTE_FORCE_V1", 7, 0.75),
-        "password_spray_suspected": ("PASSWORD_SPRAY_V1", 8, 0.80),
-        "success_after_failures": ("SUCCESS_AFTER_FAILURES_V1", 8, 0.70),
-        "ingest_storm": ("INGEST_STORM_V1", 5, 0.60),
-    }
-
-    for r in corr.reasons:
-        if r not in reason_to_rule:
-            continue
-        rule_id, sev, conf = reason_to_rule[r]
-        if alert_deduper.should_emit(rule_id, record.host, record.user, record.src_ip):
-            alert = build_alert(
-                rule_id=rule_id,
-                host=record.host,
-                severity=sev,
-                confidence=conf,
-                user=record.user,
-                src_ip=record.src_ip,
-                reasons=[r],
-                context=corr.context,
-            )
-            alert_sink.emit(alert)
-            audit.write({
-                "type": "alert_emitted",
-                "alert_id": alert.alert_id,
-                "rule_id": alert.rule_id,
-                "host": alert.host,
-                "severity": alert.severity,
-                "confidence": alert.confidence,
-                "reasons": alert.reasons,
-            })
-
-
-    # 8) Audit accept + decisions
-    audit.write({
-        "type": "gateway_accept",
-        "path": "/ingest",
-        "client_ip": client_ip,
-        "verification_status": "pass",
-        "verification_reason": "ok",
-        "body_sha256": body_hash,
-        "event_id": event.event_id,
-        "host": event.host,
-        "source": event.source,
-        "category": event.category,
-        "action": event.action,
-        "severity": event.severity,
-    })
-
-    audit.write({
-        "type": "correlation_decision",
-        "event_id": corr.event_id,
-        "host": corr.host,
-        "decision": corr.decision,
-        "reasons": corr.reasons,
-        "context": corr.context,
-    })
-
-    audit.write({
-        "type": "policy_decision",
-        "event_id": policy.event_id,
-        "host": policy.host,
-        "decision": policy.decision,
-        "reasons": policy.reasons,
-        "context": policy.context,
-    })
+    # 7) Correlation + Policy + alerts + accept audit, micro-batched
+    correlation, policy = await ingest_batcher.submit((record, client_ip))
 
-    return JSONResponse({
+    return ORJSONResponse({
         "accepted": True,
         "event_id": event.event_id,
         "gateway_reason": "ok",
-        "correlation": {
-            "decision": corr.decision,
-            "reasons": corr.reasons,
-            "context": corr.context,
-        },
-        "policy": {
-            "decision": policy.decision,
-            "reasons": policy.reasons,
-            "context": policy.context,
-        },
-        "final_decision": final_decision,
+        "correlation": correlation,
+        "policy": policy,
+        "final_decision": policy["decision"],
     })
 
 @app.get("/hosts/{host}/state")
@@ -1,34 +1,49 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+import time
+from typing import Optional
 
 
-@dataclass
-class WindowCounter:
-    window_start: datetime
-    count: int
+_COUNT_BITS = 32
+_COUNT_MASK = (1 << _COUNT_BITS) - 1
 
 
 class FixedWindowRateLimiter:
     """
     MVP: per-key fixed window limiter (e.g., 60 events per 60 seconds per strategy_id).
-    """
-    def __init__(self, limit: int, window_seconds: int):
-        self.limit = limit
-        self.window = timedelta(seconds=window_seconds)
-        self._counters: dict[str, WindowCounter] = {}
-
-    def allow(self, key: str) -> tuple[bool, str]:
-        now = datetime.now(timezone.utc)
-        counter = self._counters.get(key)
 
-        if counter is None or (now - counter.window_start) >= self.window:
-            self._counters[key] = WindowCounter(window_start=now, count=1)
-            return True, "ok"
+    Windows are aligned to the epoch (window index = now // window). Each
+    key holds one packed int, (window index << 32) | count, so a check is
+    a dict read, integer arithmetic and at most one dict write.
 
-        if counter.count >= self.limit:
-            return False, "rate_limited"
-
-        counter.count += 1
+    Only the current window's counts can matter, so when a check lands in a
+    later window all older slots are dropped: memory is bounded by the keys
+    seen in one window, even for keys that are never seen again. A check
+    stamped in an earlier window (a request that was slow to read and
+    verify) is counted against the current window rather than resetting it.
+    """
+    def __init__(self, limit: int, window_seconds: int, reason: str = "rate_limited"):
+        self.limit = limit
+        self.window_ns = window_seconds * 1_000_000_000
+        self.reason = reason
+        self._slots: dict[str, int] = {}
+        self._window = -1  # latest window seen
+
+    def allow(self, key: str, now_ns: Optional[int] = None) -> tuple[bool, str]:
+        if now_ns is None:
+            now_ns = time.time_ns()
+        window = now_ns // self.window_ns
+        if window > self._window:
+            # every stored slot belongs to an earlier window
+            self._slots.clear()
+            self._window = window
+        elif window < self._window:
+            window = self._window
+        slot = self._slots.get(key, 0)
+        count = slot & _COUNT_MASK if slot >> _COUNT_BITS == window else 0
+
+        if count >= self.limit:
+            return False, self.reason
+
+        self._slots[key] = (window << _COUNT_BITS) | (count + 1)
         return True, "ok"
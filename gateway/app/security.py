@@ -3,13 +3,19 @@ from __future__ import annotations
 import hashlib
 import hmac
 import os
-from datetime import datetime, timezone
-from typing import Tuple
+import time
+from functools import lru_cache
+from typing import Optional, Tuple
 
 
 SIG_HEADER = "X-ARES-SIGNATURE"
 SIG_PREFIX = "sha256="
 
+_sha256 = hashlib.sha256
+_BLOCK = 64  # SHA-256 block size
+_IPAD = bytes(b ^ 0x36 for b in range(256))
+_OPAD = bytes(b ^ 0x5C for b in range(256))
+
 
 def get_shared_secret() -> bytes:
     secret = os.getenv("ARES_SHARED_SECRET", "")
@@ -18,14 +24,51 @@ def get_shared_secret() -> bytes:
     return secret.encode("utf-8")
 
 
+@lru_cache(maxsize=4)
+def _hmac_pads(secret: bytes) -> tuple:
+    """
+    SHA-256 states already fed (key ^ ipad) and (key ^ opad). The secret is
+    fixed for the gateway's life, so each request only copies these instead
+    of re-deriving the pads; a rotated secret simply gets a new entry.
+    """
+    key = _sha256(secret).digest() if len(secret) > _BLOCK else secret
+    key = key.ljust(_BLOCK, b"\0")
+    return _sha256(key.translate(_IPAD)), _sha256(key.translate(_OPAD))
+
+
+def hmac_sha256_inner(secret: bytes):
+    """
+    Fresh inner HMAC state for `secret`. Feed the message with update(),
+    possibly chunk by chunk, then pass it to hmac_sha256_final().
+    """
+    return _hmac_pads(secret)[0].copy()
+
+
+def hmac_sha256_final(secret: bytes, inner) -> bytes:
+    outer = _hmac_pads(secret)[1].copy()
+    outer.update(inner.digest())
+    return outer.digest()
+
+
+def hmac_sha256(secret: bytes, body: bytes) -> bytes:
+    """
+    HMAC-SHA256 (RFC 2104) from the cached pad states.
+    """
+    inner = hmac_sha256_inner(secret)
+    inner.update(body)
+    return hmac_sha256_final(secret, inner)
+
+
 def compute_signature(secret: bytes, body: bytes) -> str:
-    mac = hmac.new(secret, body, hashlib.sha256).hexdigest()
-    return mac
+    return hmac_sha256(secret, body).hex()
 
 
-def verify_signature(secret: bytes, body: bytes, header_value: str | None) -> Tuple[bool, str]:
+def verify_signature(
+    secret: bytes, body: bytes, header_value: str | None, expected: Optional[bytes] = None
+) -> Tuple[bool, str]:
     """
     Returns (ok, reason_code)
+    `expected` is the body's MAC if already computed (e.g. while streaming it in).
     """
     if not header_value:
         return False, "missing_signature"
@@ -33,8 +76,13 @@ def verify_signature(secret: bytes, body: bytes, header_value: str | None) -> Tu
     if not header_value.startswith(SIG_PREFIX):
         return False, "bad_signature_format"
 
-    provided = header_value[len(SIG_PREFIX):].strip()
-    expected = compute_signature(secret, body)
+    # Compare raw 32-byte digests: no hex encoding of the expected MAC.
+    try:
+        provided = bytes.fromhex(header_value[len(SIG_PREFIX):].strip())
+    except ValueError:
+        return False, "bad_signature_format"
+    if expected is None:
+        expected = hmac_sha256(secret, body)
 
     if not hmac.compare_digest(provided, expected):
         return False, "signature_mismatch"
@@ -43,15 +91,18 @@ def verify_signature(secret: bytes, body: bytes, header_value: str | None) -> Tu
 
 
 def sha256_hex(body: bytes) -> str:
-    return hashlib.sha256(body).hexdigest()
+    return _sha256(body).hexdigest()
 
 
-def check_replay_window(sent_time_utc: datetime, window_seconds: int) -> Tuple[bool, str]:
+def check_replay_window(
+    sent_ts: float, window_seconds: int, now: Optional[float] = None
+) -> Tuple[bool, str]:
     """
     Reject events too far from server time to reduce replay risk.
+    Both times are POSIX seconds; `now` defaults to time.time().
     """
-    now = datetime.now(timezone.utc)
-    delta = abs((now - sent_time_utc).total_seconds())
-    if delta > window_seconds:
+    if now is None:
+        now = time.time()
+    if abs(now - sent_ts) > window_seconds:
         return False, "replay_window_exceeded"
     return True, "ok"
@@ -1,28 +1,152 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import hmac
+import io
 import json
 import os
-import uuid
+import platform
+import ssl
+import warnings
+from binascii import b2a_hex
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+from itertools import repeat
+from typing import Callable
 
 import httpx
 
+try:
+    import orjson
+except ImportError:  # stdlib fallback; the gateway signs the raw bytes, so either works
+    orjson = None
+
+
+def _dumps(event: dict) -> bytes:
+    """
+    Compact UTF-8 JSON body. orjson already emits no whitespace and keeps
+    dict insertion order. The stdlib fallback keeps the default ASCII
+    escaping: test payloads are ASCII, so the bytes are the same, and the
+    gateway signs whatever bytes it receives either way.
+    """
+    if orjson is not None:
+        return orjson.dumps(event)
+    return json.dumps(event, separators=(",", ":")).encode("ascii")
+
 
 SIG_HEADER = "X-ARES-SIGNATURE"
-SIG_PREFIX = "sha256="
+SIG_PREFIX = b"sha256="  # bytes: signatures go straight into the header
+# ARES_TEST_TLS=1 targets a gateway served over HTTPS on the same loopback port.
+TLS = os.getenv("ARES_TEST_TLS", "0") == "1"
+BASE_URL = f"{'https' if TLS else 'http'}://127.0.0.1:8000"
+
+
+@lru_cache(maxsize=1)
+def _tls_verify() -> ssl.SSLContext | bool:
+    """
+    One SSL context shared by every client, so its session cache lets
+    reconnects resume instead of doing a full handshake. Loopback only:
+    the dev certificate is not verified.
+    """
+    if not TLS:
+        return True
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
 
+def make_client() -> httpx.Client:
+    """
+    One pooled keep-alive client for every post, so the burst loops reuse
+    a connection instead of paying a TCP handshake per request.
+    """
+    return httpx.Client(
+        base_url=BASE_URL,
+        headers={"Content-Type": "application/json"},
+        timeout=5.0,
+        # limits go on the transport: a client given a transport ignores its own
+        transport=httpx.HTTPTransport(
+            retries=0,
+            verify=_tls_verify(),
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=32, keepalive_expiry=30.0),
+        ),
+    )
+
+
+def make_async_client() -> httpx.AsyncClient:
+    """
+    Async counterpart of make_client() for the order-insensitive bursts,
+    which keep up to 64 requests in flight.
+    """
+    return httpx.AsyncClient(
+        base_url=BASE_URL,
+        headers={"Content-Type": "application/json"},
+        timeout=5.0,
+        transport=httpx.AsyncHTTPTransport(
+            retries=0,
+            verify=_tls_verify(),
+            limits=httpx.Limits(max_keepalive_connections=64, max_connections=64, keepalive_expiry=30.0),
+        ),
+    )
 
-def sign(secret: str, body: bytes) -> str:
-    mac = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
-    return f"{SIG_PREFIX}{mac}"
+
+# /proc/cpuinfo flag for SHA-256 instructions, per platform.machine().
+_SHA256_CPU_FLAGS = {
+    "x86_64": "sha_ni",
+    "amd64": "sha_ni",
+    "i686": "sha_ni",
+    "aarch64": "sha2",
+    "arm64": "sha2",
+}
+
+
+def check_sha256_backend() -> None:
+    """
+    Warn when signing won't take the fast path: hashlib without OpenSSL
+    (pure-Python builds), or, on Linux, a CPU without the SHA extensions
+    (x86 sha_ni, ARM sha2). Unknown architectures are not checked.
+    """
+    if hashlib.sha256.__name__ != "openssl_sha256":
+        warnings.warn("hashlib is not OpenSSL-backed; SHA-256 signing will be slow", RuntimeWarning)
+        return
+    flag = _SHA256_CPU_FLAGS.get(platform.machine().lower())
+    if flag is None:
+        return
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = set(f.read().split())
+    except OSError:
+        return  # not Linux; nothing to check
+    if flag not in flags:
+        warnings.warn(f"CPU does not report {flag}; SHA-256 runs without hardware acceleration", RuntimeWarning)
+
+
+@lru_cache(maxsize=4)
+def _hmac_template(secret: str) -> hmac.HMAC:
+    # Keyed once per secret; sign() copies it instead of re-deriving the pads.
+    return hmac.new(secret.encode("utf-8"), None, hashlib.sha256)
+
+
+def sign(secret: str, body: bytes) -> bytes:
+    m = _hmac_template(secret).copy()
+    m.update(body)
+    return SIG_PREFIX + b2a_hex(m.digest())
+
+
+def _fast_id() -> str:
+    # 128 random bits as hex; skips building and formatting a UUID object.
+    return os.urandom(16).hex()
 
 
 def make_event(
     *,
     event_id: str | None = None,
     timestamp: datetime | None = None,
+    timestamp_iso: str | None = None,
     host: str = "host-1",
     source: str = "auth",
     category: str = "auth",
@@ -31,12 +155,12 @@ def make_event(
     user: str | None = "alice",
     src_ip: str | None = "10.0.0.5",
 ) -> dict:
-    now = datetime.now(timezone.utc)
-    ts = (timestamp or now).isoformat()
+    # Bursts pass one preformatted timestamp_iso for all their events.
+    ts = timestamp_iso or (timestamp or datetime.now(timezone.utc)).isoformat()
 
     payload = {
         "event_type": "sec.event.v1",
-        "event_id": event_id or str(uuid.uuid4()),
+        "event_id": event_id or _fast_id(),
         "source": source,
         "host": host,
         "timestamp_utc": ts,
@@ -52,43 +176,106 @@ def make_event(
     return payload
 
 
+# A serialized body with its signature header value.
+SignedBody = tuple[bytes, bytes]
+
+
+def build_event_factory(secret: str, **fields) -> Callable[[str], SignedBody]:
+    """
+    Serialize make_event(**fields) once and return a function that splices
+    only a new event_id into the prebuilt bytes and signs the result. Ids
+    must need no JSON escaping (as from _fast_id()); the timestamp is fixed
+    at build time.
+
+    The HMAC state is fed the constant prefix once; each id clones it and
+    hashes just the id and the suffix.
+    """
+    marker = _fast_id()
+    before, after = _dumps(make_event(event_id=marker, **fields)).split(marker.encode("ascii"))
+    prefix_mac = _hmac_template(secret).copy()
+    prefix_mac.update(before)
+
+    def build(event_id: str) -> SignedBody:
+        eid = event_id.encode("ascii")
+        m = prefix_mac.copy()
+        m.update(eid)
+        m.update(after)
+        return before + eid + after, SIG_PREFIX + b2a_hex(m.digest())
+
+    return build
+
+
+def _prepare(secret: str, event: dict | SignedBody, tamper_sig: bool, use_hmac: bool) -> tuple[bytes, dict]:
+    # a tuple is an already serialized, signed body from build_event_factory()
+    if isinstance(event, tuple):
+        body, sig = event
+    else:
+        body, sig = _dumps(event), None
+
+    # Content-Type lives on the client, so per-request headers are at most
+    # the one signature entry; each call gets its own dict.
+    if not use_hmac:
+        return body, {}
+    if sig is None:
+        sig = sign(secret, body)
+    if tamper_sig:
+        sig = sig.replace(b"a", b"b", 1)
+    return body, {SIG_HEADER: sig}
+
+
+def _result(r: httpx.Response):
+    try:
+        return r.status_code, r.json()
+    except Exception:
+        return r.status_code, r.text
+
+
 def post_event(
     client: httpx.Client,
     secret: str,
-    event: dict,
+    event: dict | SignedBody,
     *,
     tamper_sig: bool = False,
     use_hmac: bool = True,
 ):
-    body = json.dumps(event, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
-    headers = {"Content-Type": "application/json"}
+    body, headers = _prepare(secret, event, tamper_sig, use_hmac)
+    return _result(client.post("/ingest", content=body, headers=headers))
 
-    if use_hmac:
-        sig = sign(secret, body)
-        if tamper_sig:
-            sig = sig.replace("a", "b", 1)
-        headers[SIG_HEADER] = sig
-
-    r = client.post(
-        "http://127.0.0.1:8000/ingest",
-        content=body,
-        headers=headers,
-        timeout=5.0,
-    )
-    try:
-        return r.status_code, r.json()
-    except Exception:
-        return r.status_code, r.text
+
+async def post_event_async(
+    client: httpx.AsyncClient,
+    secret: str,
+    event: dict | SignedBody,
+    *,
+    tamper_sig: bool = False,
+    use_hmac: bool = True,
+):
+    body, headers = _prepare(secret, event, tamper_sig, use_hmac)
+    return _result(await client.post("/ingest", content=body, headers=headers))
 
 
-def main():
-    secret = os.getenv("ARES_SHARED_SECRET", "")
-    if not secret:
-        raise RuntimeError("Set ARES_SHARED_SECRET before running tests.")
+async def post_burst(secret: str, events: list[dict | SignedBody]) -> list:
+    """
+    Post `events` concurrently; results (or exceptions) come back in input
+    order, though the gateway may have processed them in any order.
+    """
+    async with make_async_client() as client:
+        return await asyncio.gather(
+            *(post_event_async(client, secret, e) for e in events),
+            return_exceptions=True,
+        )
+
 
-    with httpx.Client() as client:
+def _storm_count(result) -> int:
+    if isinstance(result, BaseException) or not isinstance(result[1], dict):
+        return 0
+    return result[1].get("correlation", {}).get("context", {}).get("storm_count", 0)
+
+
+def run_gateway_checks(secret: str) -> None:
+    with make_client() as client:
         print("1) Valid event")
-        eid = str(uuid.uuid4())
+        eid = _fast_id()
         event = make_event(event_id=eid)
         print(post_event(client, secret, event))
 
@@ -105,26 +292,31 @@ def main():
         event4 = make_event(event_id=eid)
         print(post_event(client, secret, event4))
 
-        print("\n5) Rate limit burst (per host)")
-        # With SEC_RATE_LIMIT_PER_MIN default 300, this may not trigger unless you spam.
-        # Lower SEC_RATE_LIMIT_PER_MIN (e.g., 30) to see quickly.
-        for i in range(0, 400):
-            e = make_event(host="host-ratelimit")
-            code, _ = post_event(client, secret, e)
-            if code == 429:
-                print(f"Rate limited at request #{i+1}")
-                break
-        else:
-            print("Did not hit rate limit (increase burst or lower SEC_RATE_LIMIT_PER_MIN).")
-
-        print("\n6) Brute force detection (8 failed logins within 60s for same user/host)")
-        host = "host-bruteforce"
-        user = "alice"
-        last = None
+
+def run_rate_limit_burst(secret: str) -> None:
+    print("\n5) Rate limit burst (per host)")
+    # With SEC_RATE_LIMIT_PER_MIN default 300, this may not trigger unless you spam.
+    # Lower SEC_RATE_LIMIT_PER_MIN (e.g., 30) to see quickly.
+    # Order doesn't matter here, so the burst is sent concurrently.
+    body = build_event_factory(secret, host="host-ratelimit")
+    results = asyncio.run(post_burst(secret, [body(_fast_id()) for _ in range(400)]))
+    codes = [r[0] for r in results if not isinstance(r, BaseException)]
+    limited = codes.count(429)
+    if limited:
+        print(f"Rate limited {limited} of {len(results)} requests ({codes.count(200)} accepted)")
+    else:
+        print("Did not hit rate limit (increase burst or lower SEC_RATE_LIMIT_PER_MIN).")
+
+
+def run_brute_force(secret: str) -> None:
+    print("\n6) Brute force detection (8 failed logins within 60s for same user/host)")
+    host = "host-bruteforce"
+    user = "alice"
+    # Only the event_id changes between these attempts: splice it into one serialized body.
+    failed_login = build_event_factory(secret, host=host, user=user, action="login_failed", severity=6)
+    with make_client() as client:
         for i in range(8):
-            e = make_event(host=host, user=user, action="login_failed", severity=6)
-            code, body = post_event(client, secret, e)
-            last = (code, body)
+            code, body = post_event(client, secret, failed_login(_fast_id()))
             if isinstance(body, dict):
                 print(
                     i + 1,
@@ -139,37 +331,50 @@ def main():
 
         # Optional: demonstrate that policy cooldown suppresses follow-up
         print("\n7) Post-detection suppression (send another event immediately)")
-        e_after = make_event(host=host, user=user, action="login_failed", severity=6)
-        print(post_event(client, secret, e_after))
+        print(post_event(client, secret, failed_login(_fast_id())))
 
-        print("\n8) Ingest storm detection (many events quickly)")
-        host = "host-storm"
-        for i in range(60):
-            e = make_event(host=host, source="sysmon", category="process", action="proc_start", severity=3, user=None, src_ip=None)
-            code, body = post_event(client, secret, e)
-            if i in (0, 10, 20, 40, 59):
-                if isinstance(body, dict):
-                    print(
-                        i + 1,
-                        code,
-                        body.get("correlation", {}).get("decision"),
-                        body.get("correlation", {}).get("reasons"),
-                    )
-                else:
-                    print(i + 1, code, body)
-
-        print("\n9) Password spray detection (same src_ip, many users failing)")
-        host = "host-spray"
-        src_ip = "203.0.113.9"
-        users = ["alice", "bob", "charlie", "dana", "eve", "frank", "grace"]
-
-        # Make 12 failures by cycling through users
-        last = None
+
+def run_storm(secret: str) -> None:
+    print("\n8) Ingest storm detection (many events quickly)")
+    host = "host-storm"
+    # Only the count in the window matters, so the burst is sent concurrently.
+    body = build_event_factory(
+        secret, host=host, source="sysmon", category="process", action="proc_start", severity=3,
+        user=None, src_ip=None,
+    )
+    events = [body(_fast_id()) for _ in range(60)]
+    results = asyncio.run(post_burst(secret, events))
+    # Sort back into the order the gateway counted them.
+    results.sort(key=_storm_count)
+    for i, result in enumerate(results):
+        if isinstance(result, BaseException):
+            print(i + 1, repr(result))
+            continue
+        code, body = result
+        if i in (0, 10, 20, 40, 59):
+            if isinstance(body, dict):
+                print(
+                    i + 1,
+                    code,
+                    body.get("correlation", {}).get("decision"),
+                    body.get("correlation", {}).get("reasons"),
+                )
+            else:
+                print(i + 1, code, body)
+
+
+def run_password_spray(secret: str) -> None:
+    print("\n9) Password spray detection (same src_ip, many users failing)")
+    host = "host-spray"
+    src_ip = "203.0.113.9"
+    users = ["alice", "bob", "charlie", "dana", "eve", "frank", "grace"]
+
+    # Make 12 failures by cycling through users
+    with make_client() as client:
         for i in range(12):
             u = users[i % len(users)]
             e = make_event(host=host, user=u, src_ip=src_ip, action="login_failed", severity=6)
             code, body = post_event(client, secret, e)
-            last = (code, body)
             if isinstance(body, dict):
                 print(
                     i + 1,
@@ -183,18 +388,53 @@ def main():
                 print(i + 1, code, body)
 
 
-        print("\n10) Success after failures (failures then success)")
-        host = "host-success"
-        user = "alice"
-        src_ip = "198.51.100.10"
+def run_success_after_failures(secret: str) -> None:
+    print("\n10) Success after failures (failures then success)")
+    host = "host-success"
+    user = "alice"
+    src_ip = "198.51.100.10"
+    failed_login = build_event_factory(secret, host=host, user=user, src_ip=src_ip, action="login_failed", severity=6)
+    with make_client() as client:
         for i in range(6):
-            e = make_event(host=host, user=user, src_ip=src_ip, action="login_failed", severity=6)
-            post_event(client, secret, e)
+            post_event(client, secret, failed_login(_fast_id()))
 
         # now send login_success
         e_success = make_event(host=host, user=user, src_ip=src_ip, action="login_success", severity=7)
         print(post_event(client, secret, e_success))
 
 
+def _captured(section: Callable[[str], None], secret: str) -> str:
+    # Run a section in a worker and hand its output back to be printed in order.
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        section(secret)
+    return buf.getvalue()
+
+
+# Sections 5-10 each use their own host, so they don't affect one another.
+# Order-sensitive steps stay sequential inside their section.
+SECTIONS: tuple[Callable[[str], None], ...] = (
+    run_rate_limit_burst,
+    run_brute_force,
+    run_storm,
+    run_password_spray,
+    run_success_after_failures,
+)
+
+
+def main():
+    secret = os.getenv("ARES_SHARED_SECRET", "")
+    if not secret:
+        raise RuntimeError("Set ARES_SHARED_SECRET before running tests.")
+    check_sha256_backend()
+
+    run_gateway_checks(secret)
+
+    # Run the independent sections side by side; print their output in order.
+    with ProcessPoolExecutor(max_workers=min(len(SECTIONS), os.cpu_count() or 1)) as pool:
+        for output in pool.map(_captured, SECTIONS, repeat(secret)):
+            print(output, end="")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from gateway.app.rate_limit import FixedWindowRateLimiter
+
+SEC = 1_000_000_000
+
+
+def test_limit_within_window() -> None:
+    rl = FixedWindowRateLimiter(limit=2, window_seconds=60)
+    assert rl.allow("h", 0)[0]
+    assert rl.allow("h", 1 * SEC)[0]
+    assert rl.allow("h", 2 * SEC) == (False, "rate_limited")
+    # next window starts from zero
+    assert rl.allow("h", 60 * SEC)[0]
+
+
+def test_stale_stamp_counts_against_current_window() -> None:
+    rl = FixedWindowRateLimiter(limit=2, window_seconds=60)
+    assert rl.allow("h", 61 * SEC)[0]
+    # stamped in the previous window, checked after the limiter moved on
+    assert rl.allow("h", 59 * SEC)[0]
+    assert not rl.allow("h", 62 * SEC)[0]
+    assert not rl.allow("h", 58 * SEC)[0]
+    assert not rl.allow("h", 63 * SEC)[0]